@@ -11,28 +11,26 @@ This script demonstrates:
 """
 
 import os
+import re
+import asyncio
+import aiohttp
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from lxml import etree
 from datetime import datetime, timedelta
-import urllib3
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import time
-import psycopg2
+import psycopg
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Disable SSL warnings (use cautiously in production)
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
 # === Configuration ===
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 TELEGRAM_CHAT_IDS = os.getenv("TELEGRAM_CHAT_IDS", "").split(",")
 
 DB_CONFIG = {
     "host": os.getenv("DB_HOST", "localhost"),
-    "database": os.getenv("DB_NAME", "shipments_db"),
+    "dbname": os.getenv("DB_NAME", "shipments_db"),
     "user": os.getenv("DB_USER", "collector"),
     "password": os.getenv("DB_PASSWORD"),
 }
@@ -44,16 +42,43 @@ PASSWORD = os.getenv("PVS_PASSWORD", "demo_pass")
 # List of PVS instance identifiers (e.g., location codes)
 PVS_IDENTIFIERS = os.getenv("PVS_LIST", "site1,site2,site3").split(",")
 
+# How many PVS are scraped at once, and detail pages in flight per PVS
+PVS_CONCURRENCY = int(os.getenv("PVS_CONCURRENCY", "32"))
+DETAIL_CONCURRENCY = int(os.getenv("DETAIL_CONCURRENCY", "16"))
+
+
+def _cell(name: str) -> str:
+    """XPath step selecting a row cell by its class token (like bs4's class_)."""
+    return f"td[contains(concat(' ', normalize-space(@class), ' '), ' {name} ')]"
+
+
+# Precompiled XPaths for the cells of one shipments listing row
+_CREATED_XP = etree.XPath(f"string(./{_cell('cell-createdAt')})")
+_EXTERNAL_ID_XP = etree.XPath(f"string((./{_cell('cell-externalId')}//a)[1])")
+_DETAIL_HREF_XP = etree.XPath(f"string((./{_cell('cell-externalId')}//a)[1]/@href)")
+_STATUS_XP = etree.XPath(f"string(./{_cell('cell-status')})")
+_CLOSED_XP = etree.XPath(f"string(./{_cell('cell-closedAt')})")
+_UNLOAD_STARTED_XP = etree.XPath(f"string(./{_cell('cell-unloadStartedAt')})")
+
+# Detail page: the <dd> that follows the <dt> containing $label
+_PACK_VALUE_XP = etree.XPath("string((.//dt[contains(., $label)])[1]/following-sibling::dd[1])")
+_NON_DIGITS_RE = re.compile(r"\D+")
+
+# Response bodies are fed to the HTML parser in chunks of this size
+_CHUNK_SIZE = 64 * 1024
+
+# One keep-alive session for all Telegram sends
+_tg_session = requests.Session()
+_tg_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
 
 def send_telegram_message(message: str):
-    """Send message to Telegram via direct IP to bypass DNS issues."""
+    """Send message to every configured Telegram chat."""
     if not TELEGRAM_TOKEN or not TELEGRAM_CHAT_IDS[0]:
         print("Чат айди не найден, пропуск отсылки отчета")
         return
 
-    telegram_ip = "149.154.167.220"  # api.telegram.org
-    url = f"https://{telegram_ip}/bot{TELEGRAM_TOKEN}/sendMessage"
-    headers = {"Host": "api.telegram.org"}
+    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
 
     for chat_id in TELEGRAM_CHAT_IDS:
         try:
@@ -62,178 +87,271 @@ def send_telegram_message(message: str):
                 "text": message,
                 "disable_web_page_preview": True,
             }
-            response = requests.post(url, data=payload, headers=headers, verify=False, timeout=10)
+            response = _tg_session.post(url, data=payload, timeout=10)
             if response.status_code != 200:
                 print(f"Telegram error for {chat_id}: {response.status_code}")
         except Exception as e:
             print(f"Ошибка отправки в Телеграмм: {e}")
 
 
-def save_group_to_db(pvs_name: str, group: list, group_index: int, today_date: str, count: int, unload_duration_seconds: int):
-    """Save shipment group to PostgreSQL."""
-    conn = None
+SHIPMENTS_INSERT_SQL = """
+    INSERT INTO shipments (
+        report_id, pvs_name, delivery_date, created_at,
+        unload_started_at, closed_at, status,
+        sent, received, excess, group_index,
+        boxes_count, unload_duration_seconds
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+def aggregate_group(group: list) -> dict:
+    """Collect a group's time bounds, totals and status in a single pass."""
+    first_created = last_created = group[0]["created_dt"]
+    earliest_start = None
+    latest_close = None
+    total_sent = total_received = total_excess = 0
+    any_in_progress = False
+    all_pending = all_closed = True
+
+    for s in group:
+        created_dt = s["created_dt"]
+        if created_dt < first_created:
+            first_created = created_dt
+        elif created_dt > last_created:
+            last_created = created_dt
+
+        if s["unload_started_at"] != "-":
+            started = parse_datetime(s["unload_started_at"])
+            if started and (earliest_start is None or started < earliest_start):
+                earliest_start = started
+        if s["closed_at"] != "-":
+            closed = parse_datetime(s["closed_at"])
+            if closed and (latest_close is None or closed > latest_close):
+                latest_close = closed
+
+        total_sent += s.get("sent", 0)
+        total_received += s.get("received", 0)
+        total_excess += s.get("excess", 0)
+
+        shipment_status = s["status"]
+        if shipment_status == "in_progress":
+            any_in_progress = True
+        if shipment_status != "pending":
+            all_pending = False
+        if shipment_status != "closed":
+            all_closed = False
+
+    if any_in_progress:
+        status = "in_progress"
+    elif all_pending:
+        status = "pending"
+    else:
+        status = "closed"
+
+    return {
+        "first_created": first_created,
+        "last_created": last_created,
+        "earliest_start": earliest_start,
+        "latest_close": latest_close,
+        "status": status,
+        "all_closed": all_closed,
+        "sent": total_sent,
+        "received": total_received,
+        "excess": total_excess,
+    }
+
+
+def build_group_row(pvs_name: str, stats: dict, group_index: int, today_date: str, count: int, unload_duration_seconds: int):
+    """Build the shipments table row for one aggregated shipment group."""
+    run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    report_id = f"GROUP_{run_id}_{pvs_name}_{group_index}"
+    closed_at = stats["latest_close"] if stats["all_closed"] else None
+
+    return (
+        report_id, pvs_name, today_date, stats["first_created"],
+        stats["earliest_start"], closed_at, stats["status"],
+        stats["sent"], stats["received"], stats["excess"],
+        group_index, count, unload_duration_seconds
+    )
+
+
+def save_rows_to_db(rows: list):
+    """Insert all collected group rows over one connection in one transaction.
+
+    With prepare_threshold=0 the INSERT is prepared server-side on its first
+    execution. psycopg picks int2/int4/int8 dumpers by value size, so rows
+    whose totals differ in magnitude may get separate prepared statements.
+    Int and timestamp parameters go over the binary protocol.
+    """
+    if not rows:
+        return
     try:
-        run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
-        report_id = f"GROUP_{run_id}_{pvs_name}_{group_index}"
+        with psycopg.connect(**DB_CONFIG, prepare_threshold=0) as conn:
+            with conn.cursor() as cur:
+                cur.executemany(SHIPMENTS_INSERT_SQL, rows)
+    except Exception as e:
+        print(f"Ошибка БД ({len(rows)} rows): {e}")
 
-        total_sent = sum(s.get("sent", 0) for s in group)
-        total_received = sum(s.get("received", 0) for s in group)
-        total_excess = sum(s.get("excess", 0) for s in group)
 
-        def safe_parse(dt_str):
-            try:
-                return datetime.strptime(dt_str.strip(), "%Y-%m-%d %H:%M:%S")
-            except:
-                return None
+def parse_datetime(date_str: str):
+    """Parse a "YYYY-MM-DD HH:MM:SS" timestamp, or return None."""
+    try:
+        return datetime.fromisoformat(date_str.strip())
+    except ValueError:
+        return None
 
-        created_at = min(s["created_dt"] for s in group)
-        start_times = [safe_parse(s["unload_started_at"]) for s in group if s.get("unload_started_at", "-") != "-"]
-        unload_started_at = min(t for t in start_times if t) if start_times else None
 
-        statuses = [s.get("status", "").lower() for s in group]
-        closed_at = None
-        if all(s == "closed" for s in statuses):
-            close_times = [safe_parse(s["closed_at"]) for s in group if s.get("closed_at", "-") != "-"]
-            closed_at = max(t for t in close_times if t) if close_times else None
+async def iter_completed_elements(response: aiohttp.ClientResponse, tag: str, predicate):
+    """Yield each finished <tag> element matching predicate while the body streams in.
 
-        if any(s == "in_progress" for s in statuses):
-            status = "in_progress"
-        elif all(s == "pending" for s in statuses):
-            status = "pending"
-        else:
-            status = "closed"
-
-        conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO shipments (
-                report_id, pvs_name, delivery_date, created_at,
-                unload_started_at, closed_at, status,
-                sent, received, excess, group_index,
-                boxes_count, unload_duration_seconds
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            report_id, pvs_name, today_date, created_at,
-            unload_started_at, closed_at, status,
-            total_sent, total_received, total_excess,
-            group_index, count, unload_duration_seconds
-        ))
-        conn.commit()
-        cur.close()
-    except Exception as e:
-        print(f"Ошибка БД {pvs_name} (group {group_index}): {e}")
-    finally:
-        if conn:
-            conn.close()
+    Only end events for the one tag are reported, so the caller never walks
+    the rest of the document.
+    """
+    parser = etree.HTMLPullParser(events=("end",), tag=tag, encoding=response.charset or "utf-8")
+    async for chunk in response.content.iter_chunked(_CHUNK_SIZE):
+        parser.feed(chunk)
+        for _, elem in parser.read_events():
+            if predicate(elem):
+                yield elem
+    parser.close()
+    for _, elem in parser.read_events():
+        if predicate(elem):
+            yield elem
 
 
-def parse_datetime(date_str: str):
-    try:
-        return datetime.strptime(date_str.strip(), "%Y-%m-%d %H:%M:%S")
-    except:
-        return None
+def _is_listing_row(tr) -> bool:
+    tbody = tr.getparent()
+    if tbody is None or tbody.tag != "tbody":
+        return False
+    table = tbody.getparent()
+    return table is not None and table.tag == "table" and table.get("id") == "list-table"
 
 
-def get_details_from_detail_page(session, detail_url: str):
+def _is_packs_section(div) -> bool:
+    return div.get("id") == "packsInfoContainer"
+
+
+def _listing_row_fields(row) -> tuple:
+    """Read (created, id, href, status, closed, unload started) from a listing row."""
+    return (
+        _CREATED_XP(row).strip(),
+        _EXTERNAL_ID_XP(row).strip(),
+        _DETAIL_HREF_XP(row).strip(),
+        _STATUS_XP(row).strip().lower(),
+        _CLOSED_XP(row).strip(),
+        _UNLOAD_STARTED_XP(row).strip(),
+    )
+
+
+def _pack_value(packs_section, label_keyword: str) -> int:
+    digits = _NON_DIGITS_RE.sub("", _PACK_VALUE_XP(packs_section, label=label_keyword))
+    return int(digits) if digits else 0
+
+
+async def get_details_from_detail_page(session: aiohttp.ClientSession, detail_url: str):
     """Extract numeric metrics from a shipment detail page."""
     try:
-        response = session.get(detail_url, verify=False, timeout=10)
-        if response.status_code != 200:
-            return None
-        soup = BeautifulSoup(response.text, "html.parser")
-        packs_section = soup.find("div", id="packsInfoContainer")
-        if not packs_section:
-            return None
-
-        def extract_value(label_keyword: str):
-            dt = packs_section.find("dt", string=lambda x: x and label_keyword in x)
-            if dt:
-                dd = dt.find_next_sibling("dd")
-                if dd:
-                    text = dd.get_text(strip=True)
-                    digits = ''.join(filter(str.isdigit, text))
-                    return int(digits) if digits else 0
-            return 0
-
-        return {
-            "sent": extract_value("Sent"),
-            "received": extract_value("Received"),
-            "excess": extract_value("Excess")
-        }
+        details = None
+        async with session.get(detail_url, timeout=aiohttp.ClientTimeout(sock_connect=10, sock_read=10)) as response:
+            if response.status != 200:
+                return None
+            # Keep reading to the end so the connection goes back to the pool
+            async for packs_section in iter_completed_elements(response, "div", _is_packs_section):
+                if details is None:
+                    details = {
+                        "sent": _pack_value(packs_section, "Sent"),
+                        "received": _pack_value(packs_section, "Received"),
+                        "excess": _pack_value(packs_section, "Excess")
+                    }
+        return details
     except Exception as e:
         print(f"Ошибка обработки детальной страницы ({detail_url}): {e}")
         return None
 
 
-def process_pvs(pvs_id: str):
-    """Process one PVS instance."""
+async def process_pvs(pvs_id: str, connector: aiohttp.BaseConnector):
+    """Process one PVS instance.
+
+    Each PVS gets its own cookie jar for the login, while sockets come
+    from the shared connector.
+    """
     base_url = f"https://example-pvs-{pvs_id}.local"
     login_url = f"{base_url}/user/login"
     data_url = f"{base_url}/shipments/incoming/"
 
-    session = requests.Session()
-    session.headers.update({"User-Agent": "Mozilla/5.0 (compatible; PVS-Collector/1.0)"})
+    session = aiohttp.ClientSession(
+        connector=connector,
+        connector_owner=False,
+        headers={"User-Agent": "Mozilla/5.0 (compatible; PVS-Collector/1.0)"},
+    )
 
     try:
-        # Login
-        login_page = session.get(login_url, verify=False, timeout=15)
-        if login_page.status_code != 200:
-            return {"error": f"Login page unreachable ({login_page.status_code})"}
-
-        soup = BeautifulSoup(login_page.text, "html.parser")
-        redirect_input = soup.find("input", {"name": "redirect"})
-        redirect_value = redirect_input["value"] if redirect_input else "/shipments/incoming/"
-
+        # Login: the form's redirect field is always the incoming list, so post directly
         payload = {
             "identity": USERNAME,
             "credential": PASSWORD,
-            "redirect": redirect_value
+            "redirect": "/shipments/incoming/"
         }
-        response = session.post(login_url, data=payload, allow_redirects=True, verify=False, timeout=15)
-        if "identity" in response.text and "credential" in response.text:
+        async with session.post(login_url, data=payload, timeout=aiohttp.ClientTimeout(sock_connect=15, sock_read=15)) as response:
+            if response.status != 200:
+                return {"error": f"Login page unreachable ({response.status})"}
+            login_result = await response.text()
+        if "identity" in login_result and "credential" in login_result:
             return {"error": "Login failed"}
 
+        # Detail pages are fetched as soon as their row is parsed,
+        # overlapping with the remaining listing pages
+        detail_semaphore = asyncio.Semaphore(DETAIL_CONCURRENCY)
+
+        async def fetch_details(shipment):
+            details = None
+            if shipment["detail_url"]:
+                async with detail_semaphore:
+                    details = await get_details_from_detail_page(session, shipment["detail_url"])
+            shipment.update(details or {"sent": 0, "received": 0, "excess": 0})
+
         # Scrape today's shipments
         all_shipments = []
+        detail_tasks = []
         page = 1
         today_date = datetime.now().strftime("%Y-%m-%d")
 
         while True:
             url = f"{data_url}page/{page}/order_by/createdAt/desc/" if page > 1 else data_url
             try:
-                response = session.get(url, verify=False, timeout=10)
-                if response.status_code != 200:
-                    break
-                soup = BeautifulSoup(response.text, "html.parser")
-                rows = soup.select("table#list-table tbody tr")
+                rows = []
+                async with session.get(url, timeout=aiohttp.ClientTimeout(sock_connect=10, sock_read=10)) as response:
+                    if response.status != 200:
+                        break
+                    async for row in iter_completed_elements(response, "tr", _is_listing_row):
+                        rows.append(_listing_row_fields(row))
+                        # Drop parsed rows so the tree doesn't grow with the page
+                        row.clear()
+                        while row.getprevious() is not None:
+                            del row.getparent()[0]
                 if not rows:
                     break
+                # Later pages are ordered newest first: once a page opens
+                # before today, neither it nor anything after it can match
+                if page > 1 and rows[0][0][:10] != today_date:
+                    break
 
-                new_rows_found = False
-                for row in rows:
-                    created_cell = row.find("td", class_="cell-createdAt")
-                    if not created_cell:
-                        continue
-                    created_text = created_cell.get_text(strip=True)
-                    if not created_text.startswith(today_date):
+                for created_text, shipment_id, detail_href, status, closed_text, unload_text in rows:
+                    if created_text[:10] != today_date:
                         continue
 
-                    external_id_cell = row.find("td", class_="cell-externalId")
-                    shipment_id = external_id_cell.find("a").get_text(strip=True) if external_id_cell and external_id_cell.find("a") else "—"
-                    detail_url = base_url + external_id_cell.find("a")["href"] if external_id_cell and external_id_cell.find("a") else None
+                    shipment_id = shipment_id or "—"
+                    detail_url = base_url + detail_href if detail_href else None
 
-                    status = row.find("td", class_="cell-status").get_text(strip=True).lower()
                     closed_at = "-"
                     if status == "closed":
-                        closed_elem = row.find("td", class_="cell-closedAt")
-                        closed_at = closed_elem.get_text(strip=True) if closed_elem else "-"
+                        closed_at = closed_text or "-"
 
-                    unload_started_at = row.find("td", class_="cell-unloadStartedAt").get_text(strip=True)
+                    unload_started_at = unload_text or "-"
                     created_dt = parse_datetime(created_text)
                     if not created_dt:
                         continue
 
-                    all_shipments.append({
+                    shipment = {
                         "id": shipment_id,
                         "created_dt": created_dt,
                         "created_at": created_text,
@@ -241,19 +359,21 @@ def process_pvs(pvs_id: str):
                         "closed_at": closed_at,
                         "status": status,
                         "detail_url": detail_url
-                    })
-                    new_rows_found = True
+                    }
+                    all_shipments.append(shipment)
+                    detail_tasks.append(asyncio.create_task(fetch_details(shipment)))
 
-                if not new_rows_found and page > 1:
+                if page > 1 and rows[-1][0][:10] != today_date:
                     break
                 if len(rows) < 20:
                     break
                 page += 1
-                time.sleep(0.1)
             except Exception as e:
                 print(f"Ошибка обработки {page} ошибка: {e}")
                 break
 
+        await asyncio.gather(*detail_tasks)
+
         if not all_shipments:
             return {"error": "No shipments found for today"}
 
@@ -263,31 +383,13 @@ def process_pvs(pvs_id: str):
 
         valid_shipments.sort(key=lambda x: x["created_dt"])
 
-        # Fetch details concurrently
-        details_map = {}
-        def fetch_details(shipment):
-            if not shipment["detail_url"]:
-                return shipment["id"], {"sent": 0, "received": 0, "excess": 0}
-            details = get_details_from_detail_page(session, shipment["detail_url"])
-            return shipment["id"], details or {"sent": 0, "received": 0, "excess": 0}
-
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            future_to_id = {executor.submit(fetch_details, s): s["id"] for s in valid_shipments}
-            for future in as_completed(future_to_id):
-                shipment_id, details = future.result()
-                details_map[shipment_id] = details
-
-        for shipment in valid_shipments:
-            details = details_map[shipment["id"]]
-            shipment.update(details)
-
         # Group shipments: night (0–8h) + day (hourly windows)
         groups = []
         night = [s for s in valid_shipments if s["created_dt"].hour < 8]
         day = [s for s in valid_shipments if s["created_dt"].hour >= 8]
 
         if night:
-            groups.append(sorted(night, key=lambda x: x["created_dt"]))
+            groups.append(night)
 
         if day:
             current = [day[0]]
@@ -304,21 +406,12 @@ def process_pvs(pvs_id: str):
 
         # Build report
         lines = [f"📍 ПВЗ: {pvs_id}\n"]
+        rows = []
         for idx, group in enumerate(groups, 1):
-            start_times = [parse_datetime(s["unload_started_at"]) for s in group if s["unload_started_at"] != "-"]
-            earliest_start = min(start_times) if start_times else None
-
-            statuses = [g["status"] for g in group]
-            if "in_progress" in statuses:
-                group_status = "in_progress"
-                latest_close = None
-            elif all(s == "pending" for s in statuses):
-                group_status = "pending"
-                latest_close = None
-            else:
-                group_status = "closed"
-                close_times = [parse_datetime(g["closed_at"]) for g in group if g["closed_at"] != "-"]
-                latest_close = max(close_times) if close_times else None
+            stats = aggregate_group(group)
+            group_status = stats["status"]
+            earliest_start = stats["earliest_start"]
+            latest_close = stats["latest_close"] if group_status == "closed" else None
 
             duration_seconds = 0
             if group_status == "closed" and earliest_start and latest_close:
@@ -330,12 +423,8 @@ def process_pvs(pvs_id: str):
                 duration = now - earliest_start if earliest_start else timedelta(0)
                 duration_str = str(duration).split('.')[0]
 
-            first_created = min(g["created_dt"] for g in group).strftime("%H:%M")
-            last_created = max(g["created_dt"] for g in group).strftime("%H:%M")
-
-            total_sent = sum(s["sent"] for s in group)
-            total_received = sum(s["received"] for s in group)
-            total_excess = sum(s["excess"] for s in group)
+            first_created = stats["first_created"].strftime("%H:%M")
+            last_created = stats["last_created"].strftime("%H:%M")
             count = len(group)
 
             lines.append(
@@ -347,35 +436,60 @@ def process_pvs(pvs_id: str):
                 f"Unload duration: {duration_str}\n"
                 f"Status: {group_status.capitalize()}\n"
                 f"Boxes: {count}\n"
-                f"Sent: {total_sent}\n"
-                f"Received: {total_received}\n"
-                f"Excess: {total_excess}\n"
+                f"Sent: {stats['sent']}\n"
+                f"Received: {stats['received']}\n"
+                f"Excess: {stats['excess']}\n"
             )
 
-            save_group_to_db(pvs_id, group, idx, today_date, count, duration_seconds)
+            rows.append(build_group_row(pvs_id, stats, idx, today_date, count, duration_seconds))
 
-        return {"type": "report", "message": "".join(lines)}
+        return {"type": "report", "message": "".join(lines), "rows": rows}
 
     except Exception as e:
         return {"error": f"Critical error: {str(e)}"}
+    finally:
+        await session.close()
 
 
-if __name__ == "__main__":
-    print(f"Парсинг {len(PVS_IDENTIFIERS)} ПВЗ...")
+async def collect_all(pvs_list: list):
+    """Scrape every PVS on one event loop.
+
+    Returns the report messages and the shipments rows to insert.
+    """
+    # Enough sockets for every PVS's listing request plus its detail fetches,
+    # so no request has to queue for a connection
+    connector = aiohttp.TCPConnector(limit=PVS_CONCURRENCY * (DETAIL_CONCURRENCY + 1), ssl=False)
+    pvs_semaphore = asyncio.Semaphore(PVS_CONCURRENCY)
+
+    async def run_pvs(pvs):
+        async with pvs_semaphore:
+            return await process_pvs(pvs, connector)
+
+    try:
+        results = await asyncio.gather(
+            *(run_pvs(pvs) for pvs in pvs_list),
+            return_exceptions=True,
+        )
+    finally:
+        await connector.close()
+
     all_messages = []
+    all_rows = []
+    for pvs, result in zip(pvs_list, results):
+        if isinstance(result, Exception):
+            all_messages.append(f"{pvs}: Unhandled error — {result}")
+        elif "error" in result:
+            all_messages.append(f"Ошибка {pvs}: {result['error']}")
+        else:
+            all_messages.append(result["message"])
+            all_rows.extend(result["rows"])
+    return all_messages, all_rows
 
-    with ThreadPoolExecutor(max_workers=15) as executor:
-        futures = {executor.submit(process_pvs, pvs): pvs for pvs in PVS_IDENTIFIERS}
-        for future in as_completed(futures):
-            pvs = futures[future]
-            try:
-                result = future.result()
-                if "error" in result:
-                    all_messages.append(f"Ошибка {pvs}: {result['error']}")
-                else:
-                    all_messages.append(result["message"])
-            except Exception as e:
-                all_messages.append(f"{pvs}: Unhandled error — {e}")
+
+if __name__ == "__main__":
+    print(f"Парсинг {len(PVS_IDENTIFIERS)} ПВЗ...")
+    all_messages, all_rows = asyncio.run(collect_all(PVS_IDENTIFIERS))
+    save_rows_to_db(all_rows)
 
     for msg in all_messages:
         send_telegram_message(msg)
@@ -12,7 +12,9 @@ Features:
 
 import logging
 import os
+import time
 import psycopg2
+import psycopg2.pool
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
 from datetime import datetime, timedelta
@@ -35,6 +37,12 @@ DB_CONFIG = {
     "password": os.getenv("DB_PASSWORD"),
 }
 
+# Admins allowed to run /reload_whitelist
+ADMIN_CHAT_IDS = {int(x) for x in os.getenv("ADMIN_CHAT_IDS", "").split(",") if x.strip()}
+
+# How long a whitelist lookup is trusted before re-querying the DB
+WHITELIST_TTL_SECONDS = 60
+
 # Timezone and UI settings
 LOCAL_TZ = pytz.timezone(os.getenv("TIMEZONE", "Europe/Moscow"))
 PVS_PER_PAGE = int(os.getenv("ITEMS_PER_PAGE", "8"))
@@ -47,6 +55,16 @@ LOCATIONS = os.getenv("LOCATION_LIST", "").split(",") if os.getenv("LOCATION_LIS
 # Hourly slots from 6:00 to 22:00
 TIME_SLOTS = [f"{h}:00-{h+1}:00" for h in range(6, 22)]
 
+# Postgres channel notified by the AFTER INSERT trigger on data_reports (see README)
+REPORT_CHANNEL = "new_report"
+
+# Monitors re-check this often even without a notification, in case one was missed
+REPORT_RECHECK_SECONDS = 30
+# Delay before retrying a failed LISTEN connection
+LISTEN_RETRY_SECONDS = 30
+# The listener connects on the event loop, so keep a dead DB from stalling it
+LISTEN_CONNECT_TIMEOUT_SECONDS = 5
+
 # Logging setup
 logging.basicConfig(
     level=logging.INFO,
@@ -56,21 +74,54 @@ logger = logging.getLogger(__name__)
 
 
 # === DATABASE UTILITIES ===
+# Connections are reused across handlers and report polls. The pool is created
+# on first use so the bot still starts while the DB is unreachable.
+_pool = None
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = psycopg2.pool.ThreadedConnectionPool(minconn=2, maxconn=10, **DB_CONFIG)
+    return _pool
+
+def _run_query(query, params, fetch):
+    pool = _get_pool()
+    # A pooled connection may have been dropped by the server since its last
+    # use; discard it and retry once on a fresh one.
+    for attempt in range(2):
+        conn = pool.getconn()
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute(query, params or ())
+                    result = cur.fetchall() if fetch else None
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            pool.putconn(conn, close=True)
+            if attempt:
+                raise
+            continue
+        except Exception:
+            pool.putconn(conn)
+            raise
+        pool.putconn(conn)
+        return result
+
 def db_fetch(query, params=None):
-    with psycopg2.connect(**DB_CONFIG) as conn:
-        with conn.cursor() as cur:
-            cur.execute(query, params or ())
-            return cur.fetchall()
+    return _run_query(query, params, fetch=True)
 
 def db_execute(query, params=None):
-    with psycopg2.connect(**DB_CONFIG) as conn:
-        with conn.cursor() as cur:
-            cur.execute(query, params or ())
-            conn.commit()
+    _run_query(query, params, fetch=False)
+
+_whitelist_cache: dict[int, tuple[bool, float]] = {}
 
 def is_whitelisted(chat_id: int) -> bool:
+    cached = _whitelist_cache.get(chat_id)
+    if cached and time.time() - cached[1] < WHITELIST_TTL_SECONDS:
+        return cached[0]
     rows = db_fetch("SELECT 1 FROM user_whitelist WHERE chat_id = %s", (chat_id,))
-    return len(rows) > 0
+    allowed = len(rows) > 0
+    _whitelist_cache[chat_id] = (allowed, time.time())
+    return allowed
 
 
 # === UI HELPERS ===
@@ -179,6 +230,13 @@ async def show_subscriptions(update: Update, context: ContextTypes.DEFAULT_TYPE)
     msg = format_subscriptions(chat_id)
     await update.message.reply_text(msg)
 
+async def reload_whitelist(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = update.effective_chat.id
+    if chat_id not in ADMIN_CHAT_IDS:
+        return
+    _whitelist_cache.clear()
+    await update.message.reply_text("Whitelist cache cleared.")
+
 
 # === CALLBACK HANDLER ===
 async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -261,6 +319,60 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 # === REPORTING ENGINE ===
+_report_waiters: set[asyncio.Queue] = set()
+_listen_conn = None
+_listen_retry = None
+
+# Wakes every running monitor; the payload is not used for filtering, since the
+# collector's PVS names need not match this bot's location names
+def _wake_report_monitors():
+    for queue in _report_waiters:
+        queue.put_nowait(None)
+
+def _dispatch_report_notifications(fd: int):
+    try:
+        _listen_conn.poll()
+    except psycopg2.Error as e:
+        logger.error(f"❌ Report listener lost, reconnecting: {e}")
+        asyncio.get_running_loop().remove_reader(fd)
+        _listen_conn.close()
+        _connect_report_listener()
+        return
+    if _listen_conn.notifies:
+        _listen_conn.notifies.clear()
+        _wake_report_monitors()
+
+def _connect_report_listener():
+    global _listen_conn, _listen_retry
+    _listen_retry = None
+    loop = asyncio.get_running_loop()
+    try:
+        conn = psycopg2.connect(**DB_CONFIG, connect_timeout=LISTEN_CONNECT_TIMEOUT_SECONDS)
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {REPORT_CHANNEL}")
+    except psycopg2.Error as e:
+        logger.error(f"❌ Report listener connect failed, retrying in {LISTEN_RETRY_SECONDS}s: {e}")
+        _listen_retry = loop.call_later(LISTEN_RETRY_SECONDS, _connect_report_listener)
+        return
+    _listen_conn = conn
+    fd = conn.fileno()
+    loop.add_reader(fd, _dispatch_report_notifications, fd)
+    logger.info(f"👂 Listening for reports on '{REPORT_CHANNEL}'")
+    # Reports inserted while disconnected produced no notification we could see
+    _wake_report_monitors()
+
+async def start_report_listener(app: Application):
+    _connect_report_listener()
+
+async def stop_report_listener(app: Application):
+    if _listen_retry is not None:
+        _listen_retry.cancel()
+    if _listen_conn is None or _listen_conn.closed:
+        return
+    asyncio.get_running_loop().remove_reader(_listen_conn.fileno())
+    _listen_conn.close()
+
 def format_timedelta_seconds(seconds: int) -> str:
     hours, remainder = divmod(seconds, 3600)
     minutes, secs = divmod(remainder, 60)
@@ -269,32 +381,41 @@ def format_timedelta_seconds(seconds: int) -> str:
 async def monitor_hourly_slot(context, hour: int):
     time_slot = f"{hour}:00-{hour+1}:00"
     end_time = datetime.now(LOCAL_TZ).replace(minute=59, second=59, microsecond=0)
+    # inserted_at is a local-time TIMESTAMP: match the slot as a half-open range
+    # so the (location_name, delivery_date, inserted_at) index can be used
+    slot_start = end_time.replace(hour=hour, minute=0, second=0, tzinfo=None)
+    slot_end = slot_start + timedelta(hours=1)
     logger.info(f"🔍 Monitoring slot {time_slot} until {end_time.strftime('%H:%M:%S')}")
 
-    while datetime.now(LOCAL_TZ) <= end_time:
-        subs = db_fetch(
-            "SELECT DISTINCT chat_id, location_name FROM user_subscriptions WHERE time_slot = %s",
-            (time_slot,)
-        )
-        if not subs:
-            break
-
-        user_loc_map = {}
-        for chat_id, loc in subs:
-            user_loc_map.setdefault(chat_id, []).append(loc)
-
-        any_sent = False
-        for chat_id, loc_list in user_loc_map.items():
-            for loc in loc_list:
+    # Register before the first check so no notification slips in between
+    queue = asyncio.Queue()
+    _report_waiters.add(queue)
+    try:
+        while True:
+            subs = db_fetch(
+                "SELECT DISTINCT chat_id, location_name FROM user_subscriptions WHERE time_slot = %s",
+                (time_slot,)
+            )
+            if not subs:
+                break
+
+            # Each location is queried and formatted once, then sent to all its subscribers
+            loc_to_chat_ids = {}
+            for chat_id, loc in subs:
+                loc_to_chat_ids.setdefault(loc, []).append(chat_id)
+
+            any_sent = False
+            for loc, chat_ids in loc_to_chat_ids.items():
                 rows = db_fetch("""
                     SELECT location_name, delivery_date, created_at, unload_started_at, closed_at,
                            status, sent, received, excess, boxes_count, unload_duration_seconds
                     FROM data_reports
                     WHERE location_name = %s
                       AND delivery_date = CURRENT_DATE
-                      AND EXTRACT(HOUR FROM inserted_at) = %s
+                      AND inserted_at >= %s
+                      AND inserted_at < %s
                     ORDER BY inserted_at
-                """, (loc, hour))
+                """, (loc, slot_start, slot_end))
 
                 if not rows:
                     continue
@@ -325,17 +446,31 @@ async def monitor_hourly_slot(context, hour: int):
                     )
 
                 message = "\n".join(lines)
-                try:
-                    await context.bot.send_message(chat_id=chat_id, text=message)
-                    logger.info(f"📤 Report for {loc} sent to {chat_id}")
-                    any_sent = True
-                except Exception as e:
-                    logger.error(f"❌ Send error to {chat_id}: {e}")
-
-        if any_sent:
-            break
-
-        await asyncio.sleep(30)
+                for chat_id in chat_ids:
+                    try:
+                        await context.bot.send_message(chat_id=chat_id, text=message)
+                        logger.info(f"📤 Report for {loc} sent to {chat_id}")
+                        any_sent = True
+                    except Exception as e:
+                        logger.error(f"❌ Send error to {chat_id}: {e}")
+
+            if any_sent:
+                break
+
+            # Sleep until the collector reports new data; re-check anyway every
+            # REPORT_RECHECK_SECONDS in case the listener missed a notification
+            remaining = (end_time - datetime.now(LOCAL_TZ)).total_seconds()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(queue.get(), min(remaining, REPORT_RECHECK_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+            # One re-check covers every notification that arrived meanwhile
+            while not queue.empty():
+                queue.get_nowait()
+    finally:
+        _report_waiters.discard(queue)
 
 async def trigger_hourly_check(context: ContextTypes.DEFAULT_TYPE):
     now = datetime.now(LOCAL_TZ)
@@ -347,19 +482,30 @@ async def trigger_hourly_check(context: ContextTypes.DEFAULT_TYPE):
 
 # === MAIN ===
 def main():
-    app = Application.builder().token(TELEGRAM_TOKEN).build()
+    app = (
+        Application.builder()
+        .token(TELEGRAM_TOKEN)
+        .post_init(start_report_listener)
+        .post_shutdown(stop_report_listener)
+        .build()
+    )
 
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("help", help_command))
     app.add_handler(CommandHandler("choose_location", choose_location))
     app.add_handler(CommandHandler("remove_location", remove_location))
     app.add_handler(CommandHandler("subscribe", show_subscriptions))
+    app.add_handler(CommandHandler("reload_whitelist", reload_whitelist))
     app.add_handler(CallbackQueryHandler(handle_callback))
 
     app.job_queue.run_repeating(trigger_hourly_check, interval=3600, first=10)
     logger.info("🚀 Bot started. Reporting active from 6:00 to 22:00.")
 
-    app.run_polling()
+    try:
+        app.run_polling()
+    finally:
+        if _pool is not None:
+            _pool.closeall()
 
 if __name__ == "__main__":
     main()